@@ -46,13 +46,32 @@ def find_templates(root: Path) -> list[DocTemplate]:
     return [DocTemplate(p) for p in root.glob('*/metadata.yaml') if not p.name.startswith("_")]
 
 
+def find_git_repos() -> dict[Path | None, str]:
+    try:
+        print("Current path:", Path().resolve(), file=sys.stderr)
+        git_repo = git.Repo()
+        git_repos = {None: util.get_git_repo_url(git_repo.remotes[0].url)}
+        for submodule_path, submodule_url in util.get_git_submodules():
+            git_repos[Path(submodule_path).resolve()] = util.get_git_repo_url(submodule_url)
+        print("Found git repos:\n -",
+              '\n - '.join(f"{os.path.relpath(k) if k else 'Default'}: {v}" for k, v in git_repos.items()),
+              file=sys.stderr)
+        return git_repos
+    except Exception as e:
+        print(f"Error obtaining git information", file=sys.stderr)
+        import traceback
+        traceback.print_exception(e)
+        return {}
+
+
 class DocGenerator:
 
     def __init__(self,
                  base_url: str | None = None,
                  output_dir: str | Path = 'generateddocs',
                  templates_dir: str | Path = 'templates',
-                 id_prefix: str = ''):
+                 id_prefix: str = '',
+                 git_repos: dict[Path | None, str] | None = None):
         self.base_url = base_url
         self.output_dir = output_dir if isinstance(output_dir, Path) else Path(output_dir)
         self.templates_dir = templates_dir if isinstance(templates_dir, Path) else Path(templates_dir)
@@ -63,20 +82,13 @@ class DocGenerator:
         for template in self.templates:
             self.output_dir.joinpath(template.dir_name).mkdir(parents=True, exist_ok=True)
 
-        try:
-            print("Current path:", Path().resolve(), file=sys.stderr)
-            git_repo = git.Repo()
-            self.git_repos = {None: util.get_git_repo_url(git_repo.remotes[0].url)}
-            for submodule_path, submodule_url in util.get_git_submodules():
-                self.git_repos[Path(submodule_path).resolve()] = util.get_git_repo_url(submodule_url)
-            print("Found git repos:\n -",
-                  '\n - '.join(f"{os.path.relpath(k) if k else 'Default'}: {v}" for k, v in self.git_repos.items()),
-                  file=sys.stderr)
-        except Exception as e:
-            print(f"Error obtaining git information", file=sys.stderr)
-            import traceback
-            traceback.print_exception(e)
-            self.git_repos = None
+        # Documentation URL prefixes do not depend on the bblock, build them only once
+        self._doc_url_prefixes = {template.dir_name: f"{self.base_url}{self.output_dir}/{template.dir_name}/"
+                                  for template in self.templates}
+        self._slate_build_url_prefix = f"{self.base_url}{self.output_dir}/slate-build/"
+
+        # Git information can be looked up beforehand (e.g., once for several generators)
+        self.git_repos = git_repos if git_repos is not None else find_git_repos()
 
     def generate_doc(self, bblock: BuildingBlock):
         all_docs = {}
@@ -113,14 +125,14 @@ class DocGenerator:
                                         git_repo=git_repo,
                                         git_path=git_path))
                 if template.id and template.mediatype:
-                    doc_url = f"{self.base_url}{self.output_dir}/" \
-                              f"{template.dir_name}/{bblock.subdirs}/{template.template_file.name}"
+                    doc_url = f"{self._doc_url_prefixes[template.dir_name]}" \
+                              f"{bblock.subdirs}/{template.template_file.name}"
                     all_docs[template.id] = {
                         'mediatype': template.mediatype,
                         'url': doc_url,
                     }
 
-        slate_build_url = f"{self.base_url}{self.output_dir}/slate-build/{bblock.subdirs}/"
+        slate_build_url = f"{self._slate_build_url_prefix}{bblock.subdirs}/"
         all_docs['slate'] = {
             'mediatype': 'text/html',
             'url': slate_build_url,
@@ -1,24 +1,105 @@
 from __future__ import annotations
 
-import itertools
+import functools
 import json
 import os.path
-import re
 import sys
 from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import traceback
 
-from ogc.na.util import is_url
-
-from ogc.bblocks.generate_docs import DocGenerator
+from ogc.bblocks.generate_docs import DocGenerator, find_git_repos
 from ogc.bblocks.util import write_superbblocks_schemas, annotate_schema, BuildingBlock, \
-    write_jsonld_context, BuildingBlockRegister
+    write_jsonld_context, BuildingBlockRegister, is_url
 from ogc.bblocks.validate import validate_test_resources
 
 ANNOTATED_ITEM_CLASSES = ('schema', 'datatype')
 
 
+_doc_generator: DocGenerator | None = None
+
+
+def _relpath(path: str | Path, base: Path, cwd: Path) -> str:
+    # Lexical relative_to is enough (and avoids getcwd and normalization)
+    # when the path is inside base, which is the usual case
+    path = cwd / path
+    try:
+        return str(path.relative_to(base))
+    except ValueError:
+        return os.path.relpath(path, base)
+
+
+def _estimate_cost(bblock: BuildingBlock) -> int:
+    # Rough postprocessing cost: number of examples plus test resources.
+    # DirEntry.is_file() uses the d_type returned by readdir, so no extra stat per entry
+    test_count = 0
+    try:
+        with os.scandir(bblock.tests_dir) as it:
+            test_count = sum(1 for entry in it if entry.is_file())
+    except OSError:
+        pass
+    return len(bblock.examples or ()) + test_count
+
+
+def _get_doc_generator(**kwargs) -> DocGenerator:
+    # Only one DocGenerator per (worker) process
+    global _doc_generator
+    if _doc_generator is None:
+        _doc_generator = DocGenerator(**kwargs)
+    return _doc_generator
+
+
+def _do_postprocess(bblock: BuildingBlock,
+                    cwd: Path,
+                    output_file_root: Path,
+                    base_url: str | None,
+                    test_outputs_path: str | Path,
+                    test_outputs_base_url: str | None,
+                    doc_generator_args: dict) -> dict:
+    # Runs in a worker process, so the updated metadata is returned to the caller
+    print(f"Postprocessing building block {bblock.identifier}", file=sys.stderr)
+    if bblock.annotated_schema.is_file():
+        if base_url:
+            rel_annotated = _relpath(bblock.annotated_schema, cwd, cwd)
+            schema_url_yaml = f"{base_url}{rel_annotated}"
+        else:
+            schema_url_yaml = './' + _relpath(bblock.annotated_schema, output_file_root, cwd)
+        if schema_url_yaml.endswith('.yaml'):
+            schema_url_json = schema_url_yaml[:-len('.yaml')] + '.json'
+        else:
+            schema_url_json = schema_url_yaml
+        bblock.metadata['schema'] = {
+            'application/yaml': schema_url_yaml,
+            'application/json': schema_url_json,
+        }
+    if bblock.jsonld_context.is_file():
+        if base_url:
+            rel_context = _relpath(bblock.jsonld_context, cwd, cwd)
+            ld_context_url = f"{base_url}{rel_context}"
+        else:
+            ld_context_url = './' + _relpath(bblock.jsonld_context, output_file_root, cwd)
+        bblock.metadata['ldContext'] = ld_context_url
+
+    if base_url:
+        bblock.metadata['sourceFiles'] = f"{base_url}{_relpath(bblock.files_path, cwd, cwd)}/"
+    else:
+        bblock.metadata['sourceFiles'] = f"./{_relpath(bblock.files_path, output_file_root, cwd)}/"
+
+    print(f"  > Running tests for {bblock.identifier}", file=sys.stderr)
+    validation_passed, test_count = validate_test_resources(bblock,
+                                                            outputs_path=test_outputs_path)
+    bblock.metadata['validationPassed'] = validation_passed
+    if not validation_passed:
+        bblock.metadata['status'] = 'invalid'
+    if test_count and test_outputs_base_url:
+        bblock.metadata['testOutputs'] = f"{test_outputs_base_url}{bblock.subdirs}/"
+
+    print(f"  > Generating documentation for {bblock.identifier}", file=sys.stderr)
+    _get_doc_generator(**doc_generator_args).generate_doc(bblock)
+    return bblock.metadata
+
+
 def postprocess(registered_items_path: str | Path = 'registereditems',
                 output_file: str | Path | None = 'register.json',
                 filter_ids: str | list[str] | None = None,
@@ -46,54 +127,33 @@ def postprocess(registered_items_path: str | Path = 'registereditems',
             github_base_url += '/'
         test_outputs_base_url = f"{github_base_url}{os.path.relpath(Path(test_outputs_path).resolve(), cwd)}/"
 
-    doc_generator = DocGenerator(base_url=base_url,
-                                 output_dir=generated_docs_path,
-                                 templates_dir=templates_dir,
-                                 id_prefix=id_prefix)
-
-    def do_postprocess(bblock: BuildingBlock) -> bool:
-        output_file_root = Path(output_file).resolve().parent
-        if bblock.annotated_schema.is_file():
-            if base_url:
-                rel_annotated = os.path.relpath(bblock.annotated_schema, cwd)
-                schema_url_yaml = f"{base_url}{rel_annotated}"
-            else:
-                schema_url_yaml = './' + os.path.relpath(bblock.annotated_schema, output_file_root)
-            schema_url_json = re.sub(r'\.yaml$', '.json', schema_url_yaml)
-            bblock.metadata['schema'] = {
-                'application/yaml': schema_url_yaml,
-                'application/json': schema_url_json,
-            }
-        if bblock.jsonld_context.is_file():
-            if base_url:
-                rel_context = os.path.relpath(bblock.jsonld_context, cwd)
-                ld_context_url = f"{base_url}{rel_context}"
-            else:
-                ld_context_url = './' + os.path.relpath(bblock.jsonld_context, output_file_root)
-            bblock.metadata['ldContext'] = ld_context_url
-
-        rel_files_path = os.path.relpath(bblock.files_path)
-        if base_url:
-            bblock.metadata['sourceFiles'] = f"{base_url}{rel_files_path}/"
-        else:
-            bblock.metadata['sourceFiles'] = f"./{os.path.relpath(rel_files_path, output_file_root)}/"
-
-        print(f"  > Running tests for {bblock.identifier}", file=sys.stderr)
-        validation_passed, test_count = validate_test_resources(bblock,
-                                                                outputs_path=test_outputs_path)
-        bblock.metadata['validationPassed'] = validation_passed
-        if not validation_passed:
-            bblock.metadata['status'] = 'invalid'
-        if test_count and test_outputs_base_url:
-            bblock.metadata['testOutputs'] = f"{test_outputs_base_url}{bblock.subdirs}/"
-
-        print(f"  > Generating documentation for {bblock.identifier}", file=sys.stderr)
-        doc_generator.generate_doc(bblock)
-        return True
+    # Invariant for all bblocks, no need to resolve it every time
+    output_file_root = Path(output_file).resolve().parent if output_file else cwd
+
+    # Looked up once here, instead of once per worker process by each DocGenerator
+    git_repos = find_git_repos()
+
+    do_postprocess = functools.partial(_do_postprocess,
+                                       cwd=cwd,
+                                       output_file_root=output_file_root,
+                                       base_url=base_url,
+                                       test_outputs_path=test_outputs_path,
+                                       test_outputs_base_url=test_outputs_base_url,
+                                       doc_generator_args={
+                                           'base_url': base_url,
+                                           'output_dir': generated_docs_path,
+                                           'templates_dir': templates_dir,
+                                           'id_prefix': id_prefix,
+                                           'git_repos': git_repos,
+                                       })
 
     if not isinstance(registered_items_path, Path):
         registered_items_path = Path(registered_items_path)
 
+    if filter_ids:
+        # Set for constant-time lookups (and exact matches when a single id is passed)
+        filter_ids = {filter_ids} if isinstance(filter_ids, str) else set(filter_ids)
+
     child_bblocks = []
     super_bblocks = {}
     bbr = BuildingBlockRegister(registered_items_path,
@@ -102,6 +162,7 @@ def postprocess(registered_items_path: str | Path = 'registereditems',
                                 fail_on_error=fail_on_error,
                                 prefix=id_prefix,
                                 annotated_path=annotated_path)
+    seen_annotation_errors = set()
     for building_block in bbr.bblocks.values():
         if filter_ids and building_block.identifier not in filter_ids:
             continue
@@ -133,41 +194,72 @@ def postprocess(registered_items_path: str | Path = 'registereditems',
             except Exception as e:
                 if fail_on_error:
                     raise
-                traceback.print_exception(e, file=sys.stderr)
+                # Systemic errors tend to repeat for many bblocks; only print the full traceback once
+                error_key = (type(e).__name__, str(e)[:120])
+                if error_key in seen_annotation_errors:
+                    print(f"[Error repeat] Annotating schema for {building_block.identifier}: "
+                          f"{type(e).__name__}: {e}", file=sys.stderr)
+                else:
+                    seen_annotation_errors.add(error_key)
+                    traceback.print_exception(e, file=sys.stderr)
 
             child_bblocks.append(building_block)
 
-    print(f"Writing JSON-LD contexts", file=sys.stderr)
-    # Create JSON-lD contexts
-    for building_block in child_bblocks:
-        if building_block.annotated_schema.is_file():
+    output_bblocks = []
+    # A single pool (and set of worker processes) is used for both the JSON-LD contexts and postprocessing
+    with ProcessPoolExecutor() as executor:
+        print(f"Writing JSON-LD contexts", file=sys.stderr)
+        # Create JSON-lD contexts
+        # Contexts only depend on the (already written) annotated schemas, so they can be built in parallel
+        context_futures = [(building_block, executor.submit(write_jsonld_context, building_block.annotated_schema))
+                           for building_block in child_bblocks]
+        for building_block, future in context_futures:
             try:
-                written_context = write_jsonld_context(building_block.annotated_schema)
+                written_context = future.result()
                 if written_context:
                     print(f"  - {written_context}", file=sys.stderr)
             except Exception as e:
                 if fail_on_error:
+                    executor.shutdown(cancel_futures=True)
                     raise e
                 print(f"[Error] Writing context for {building_block.identifier}: {type(e).__name__}: {e}")
 
-    # Create super bblock schemas
-    # TODO: Do not build super bb's that have children with errors
-    print(f"Generating Super Building Block schemas", file=sys.stderr)
-    try:
-        for super_bblock_schema in write_superbblocks_schemas(super_bblocks, annotated_path):
-            print(f"  - {os.path.relpath(super_bblock_schema, '.')}", file=sys.stderr)
-    except Exception as e:
-        if fail_on_error:
-            raise e
-        print(f"[Error] Writing Super BB schemas: {type(e).__name__}: {e}")
-
-    output_bblocks = []
-    for building_block in itertools.chain(child_bblocks, super_bblocks.values()):
-        print(f"Postprocessing building block {building_block.identifier}", file=sys.stderr)
-        if do_postprocess(building_block):
-            output_bblocks.append(building_block.metadata)
-        else:
-            print(f"{building_block.identifier} failed postprocessing, skipping...", file=sys.stderr)
+        # Create super bblock schemas
+        # TODO: Do not build super bb's that have children with errors
+        print(f"Generating Super Building Block schemas", file=sys.stderr)
+        try:
+            for super_bblock_schema in write_superbblocks_schemas(super_bblocks, annotated_path):
+                print(f"  - {os.path.relpath(super_bblock_schema, '.')}", file=sys.stderr)
+        except Exception as e:
+            if fail_on_error:
+                raise e
+            print(f"[Error] Writing Super BB schemas: {type(e).__name__}: {e}")
+
+        # Building blocks are postprocessed independently from each other, except for
+        # super bblocks: their test outputs directory contains those of their children,
+        # so they only start once all the children are done
+        for phase_bblocks in (child_bblocks, list(super_bblocks.values())):
+            # Submit the most expensive bblocks first to reduce the tail, but keep the output order
+            futures = {}
+            for building_block in sorted(phase_bblocks, key=_estimate_cost, reverse=True):
+                futures[building_block.identifier] = executor.submit(do_postprocess, building_block)
+
+            for building_block in phase_bblocks:
+                future = futures[building_block.identifier]
+                try:
+                    building_block.metadata = future.result()
+                    postprocessed = True
+                except Exception as e:
+                    if fail_on_error:
+                        executor.shutdown(cancel_futures=True)
+                        raise
+                    print(f"[Error] Postprocessing building block {building_block.identifier}", file=sys.stderr)
+                    traceback.print_exception(e, file=sys.stderr)
+                    postprocessed = False
+                if postprocessed:
+                    output_bblocks.append(building_block.metadata)
+                else:
+                    print(f"{building_block.identifier} failed postprocessing, skipping...", file=sys.stderr)
 
     if output_file:
         if output_file == '-':
@@ -1,30 +1,94 @@
 from __future__ import annotations
 
+import copy
 import functools
 import json
 import os.path
 import re
 import sys
-from collections import deque
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import Any, Sequence, Callable
 
 import jsonschema
 from ogc.na.annotate_schema import SchemaAnnotator, ContextBuilder
-from ogc.na.util import load_yaml, dump_yaml, is_url
+from ogc.na.util import load_yaml, dump_yaml, is_url as _is_url
 
 BBLOCK_METADATA_FILE = 'bblock.json'
 BBLOCKS_REF_ANNOTATION = 'x-bblocks-ref'
 
+HTTP_URL_PREFIXES = ('http://', 'https://')
+
+GITHUB_REPO_URL_RE = re.compile(r'^(?:git@|https?://(?:www)?)github.com[:/](.+)/(.+).git$')
+
+# Schema keywords whose values are never (or never contain) subschemas
+NON_SCHEMA_KEYWORDS = frozenset(('const', 'enum', 'default', 'examples', 'example',
+                                 'title', 'description', '$comment'))
+# Schema keywords whose values map arbitrary names to subschemas
+SCHEMA_MAP_KEYWORDS = frozenset(('properties', 'patternProperties', 'dependentSchemas',
+                                 'dependencies', '$defs', 'definitions'))
+
+PARSED_YAML_CACHE_SIZE = 128
+_parsed_yaml_cache: OrderedDict[tuple[str, int, int], Any] = OrderedDict()
+
+
+@functools.lru_cache(maxsize=4096)
+def _cached_is_url(url: str, http_only: bool = False) -> bool:
+    return _is_url(url, http_only=http_only)
+
+
+def is_url(url: Any, http_only: bool = False) -> bool:
+    # Cached version of ogc.na.util.is_url, since it is called for every $ref
+    if not isinstance(url, str):
+        return False
+    if url.startswith(HTTP_URL_PREFIXES) and len(url) > len('https://'):
+        # Fast path for the most common case, no need to parse
+        return True
+    return _cached_is_url(url, http_only)
+
 
 def load_file(fn):
     with open(fn) as f:
         return f.read()
 
 
+def load_json(filename: str | Path | None = None, content: str | bytes | None = None) -> Any:
+    # JSON parsers are much faster than YAML for JSON documents; fall back to
+    # YAML (a superset of JSON) for lenient documents that are not strict JSON
+    if filename:
+        content = Path(filename).read_bytes()
+    try:
+        return json.loads(content)
+    except ValueError:
+        return load_yaml(content=content)
+
+
+def load_yaml_cached(fn: Path, copy_result: bool = True) -> Any:
+    # Parsed documents are keyed by (path, mtime, size) so that changes on disk
+    # invalidate them. Callers that mutate the result get a copy, read-only
+    # callers (copy_result=False) get the cached document itself
+    st = fn.stat()
+    key = (str(fn), st.st_mtime_ns, st.st_size)
+    if key in _parsed_yaml_cache:
+        _parsed_yaml_cache.move_to_end(key)
+        parsed = _parsed_yaml_cache[key]
+    else:
+        parsed = load_yaml(fn)
+        _parsed_yaml_cache[key] = parsed
+        if len(_parsed_yaml_cache) > PARSED_YAML_CACHE_SIZE:
+            _parsed_yaml_cache.popitem(last=False)
+    return copy.deepcopy(parsed) if copy_result else parsed
+
+
 def get_bblock_identifier(metadata_file: Path, root_path: Path = Path(),
                           prefix: str = '') -> tuple[str, Path]:
-    rel_parts = Path(os.path.relpath(metadata_file.parent, root_path)).parts
+    try:
+        # Avoid os.path.relpath (getcwd + string arithmetic) in the common case,
+        # where metadata_file was found under root_path
+        rel_parts = metadata_file.parent.relative_to(root_path).parts
+    except ValueError:
+        rel_parts = Path(os.path.relpath(metadata_file.parent, root_path)).parts
     identifier = f"{prefix}{'.'.join(p for p in rel_parts if not p.startswith('_'))}"
     if identifier[-1] == '.':
         identifier = identifier[:-1]
@@ -53,13 +117,13 @@ class BuildingBlock:
         with open(metadata_file) as f:
             self.metadata = json.load(f)
 
-            if metadata_schema:
-                try:
-                    jsonschema.validate(self.metadata, metadata_schema)
-                except Exception as e:
-                    raise BuildingBlockError('Error validating building block metadata') from e
+        if metadata_schema:
+            try:
+                jsonschema.validate(self.metadata, metadata_schema)
+            except Exception as e:
+                raise BuildingBlockError('Error validating building block metadata') from e
 
-            self.metadata['itemIdentifier'] = identifier
+        self.metadata['itemIdentifier'] = identifier
 
         self._lazy_properties = {}
 
@@ -72,10 +136,14 @@ class BuildingBlock:
         fp = metadata_file.parent
         self.files_path = fp
 
+        # Source schemas do not change during processing, so we only check for them once
         schema = fp / 'schema.yaml'
-        if not schema.is_file():
+        schema_exists = schema.is_file()
+        if not schema_exists:
             schema = fp / 'schema.json'
+            schema_exists = schema.is_file()
         self.schema = schema
+        self.schema_exists = schema_exists
 
         ap = fp / 'assets'
         self.assets_path = ap if ap.is_dir() else None
@@ -109,7 +177,7 @@ class BuildingBlock:
     @property
     def schema_contents(self):
         if 'schema_contents' not in self._lazy_properties:
-            if not self.schema.exists():
+            if not self.schema_exists:
                 return None
             self._lazy_properties['schema_contents'] = load_file(self.schema)
         return self._lazy_properties['schema_contents']
@@ -122,6 +190,9 @@ class BuildingBlock:
         return self._lazy_properties['description']
 
     def __getattr__(self, item):
+        if item.startswith('__') or 'metadata' not in self.__dict__:
+            # Avoid recursion when unpickling (no metadata yet) and dunder lookups
+            raise AttributeError(item)
         return self.metadata.get(item)
 
     @property
@@ -145,6 +216,20 @@ class BuildingBlock:
         return self._lazy_properties['jsonld_context_contents']
 
 
+# Validation schemas for the bblocks loaded by a register worker process, set once by
+# _init_load_worker instead of being pickled into every task
+_load_worker_schemas: dict[str, Any] = {}
+
+
+def _init_load_worker(metadata_schema: Any | None, examples_schema: Any | None):
+    _load_worker_schemas['metadata_schema'] = metadata_schema
+    _load_worker_schemas['examples_schema'] = examples_schema
+
+
+def _load_bblock(identifier: str, metadata_file: Path, **kwargs) -> BuildingBlock:
+    return BuildingBlock(identifier, metadata_file, **_load_worker_schemas, **kwargs)
+
+
 class BuildingBlockRegister:
 
     def __init__(self,
@@ -166,25 +251,33 @@ class BuildingBlockRegister:
         metadata_schema = load_yaml(metadata_schema_file) if metadata_schema_file else None
         examples_schema = load_yaml(examples_schema_file) if examples_schema_file else None
 
+        found_bblocks = {}
         for metadata_file in sorted(registered_items_path.glob(f"**/{BBLOCK_METADATA_FILE}")):
             bblock_id, bblock_rel_path = get_bblock_identifier(metadata_file, registered_items_path, prefix)
-            if bblock_id in self.bblocks:
+            if bblock_id in found_bblocks:
                 raise ValueError(f"Found duplicate bblock id: {bblock_id}")
-            try:
-                bblock = BuildingBlock(bblock_id, metadata_file,
-                                       metadata_schema=metadata_schema,
-                                       examples_schema=examples_schema,
-                                       rel_path=bblock_rel_path,
-                                       annotated_path=annotated_path)
-                self.bblocks[bblock_id] = bblock
-                self.bblock_paths[bblock.files_path] = bblock
-            except Exception as e:
-                if fail_on_error:
-                    raise
-                print('==== Exception encountered while processing', bblock_id, '====', file=sys.stderr)
-                import traceback
-                traceback.print_exception(e, file=sys.stderr)
-                print('=========', file=sys.stderr)
+            found_bblocks[bblock_id] = (metadata_file, bblock_rel_path)
+
+        # Building blocks are independent from each other, so we can load them in parallel
+        with ProcessPoolExecutor(initializer=_init_load_worker,
+                                 initargs=(metadata_schema, examples_schema)) as executor:
+            futures = [(bblock_id, executor.submit(_load_bblock, bblock_id, metadata_file,
+                                                   rel_path=bblock_rel_path,
+                                                   annotated_path=annotated_path))
+                       for bblock_id, (metadata_file, bblock_rel_path) in found_bblocks.items()]
+            for bblock_id, future in futures:
+                try:
+                    bblock = future.result()
+                    self.bblocks[bblock_id] = bblock
+                    self.bblock_paths[bblock.files_path] = bblock
+                except Exception as e:
+                    if fail_on_error:
+                        executor.shutdown(cancel_futures=True)
+                        raise
+                    print('==== Exception encountered while processing', bblock_id, '====', file=sys.stderr)
+                    import traceback
+                    traceback.print_exception(e, file=sys.stderr)
+                    print('=========', file=sys.stderr)
 
         if find_dependencies:
             for bblock in self.bblocks.values():
@@ -198,33 +291,52 @@ class BuildingBlockRegister:
                     bblock.metadata['dependsOn'] = list(found_deps)
 
     def find_dependencies(self, bblock: BuildingBlock) -> set[str]:
-        if not bblock.schema.is_file():
+        if not bblock.schema_exists:
             return set()
         bblock_schema = load_yaml(filename=bblock.schema)
 
         deps = set()
+        # Collect unique refs first, so that each one is only resolved once
+        refs = set()
 
-        def walk_schema(schema):
+        # (node, whether node is a name -> schema map such as "properties")
+        pending = [(bblock_schema, False)]
+        while pending:
+            schema, is_schema_map = pending.pop()
             if isinstance(schema, dict):
+                if is_schema_map:
+                    pending.extend((val, False) for val in schema.values() if isinstance(val, (dict, list)))
+                    continue
+
                 ref = schema.get(BBLOCKS_REF_ANNOTATION, schema.get('$ref'))
                 if isinstance(ref, str):
-                    if ref.startswith('bblocks://'):
-                        # Get id directly from bblocks:// URI
-                        deps.add(ref[len('bblocks://'):])
-                    else:
-                        ref_parent_path = bblock.files_path.joinpath(ref).resolve().parent
-                        ref_bblock = self.bblock_paths.get(ref_parent_path)
-                        if ref_bblock:
-                            deps.add(ref_bblock.identifier)
+                    refs.add(ref)
 
                 for prop, val in schema.items():
-                    if prop not in (BBLOCKS_REF_ANNOTATION, '$ref') or not isinstance(val, str):
-                        walk_schema(val)
+                    # Only containers can hold subschemas; keywords in NON_SCHEMA_KEYWORDS
+                    # are instance data or annotations
+                    if isinstance(val, (dict, list)) and prop not in NON_SCHEMA_KEYWORDS:
+                        pending.append((val, prop in SCHEMA_MAP_KEYWORDS))
             elif isinstance(schema, list):
-                for item in schema:
-                    walk_schema(item)
-
-        walk_schema(bblock_schema)
+                pending.extend((item, False) for item in schema if isinstance(item, (dict, list)))
+
+        ref_files = set()
+        for ref in refs:
+            if ref.startswith('bblocks://'):
+                # Get id directly from bblocks:// URI
+                deps.add(ref[len('bblocks://'):])
+            elif not is_url(ref):
+                ref_file = ref.split('#', 1)[0]
+                if ref_file:
+                    # Local fragments ('#/...') never point to another bblock
+                    ref_files.add(ref_file)
+
+        # files_path is already absolute, so only one resolve() per referenced file is needed
+        for ref_file in ref_files:
+            ref_parent_path = bblock.files_path.joinpath(ref_file).resolve().parent
+            ref_bblock = self.bblock_paths.get(ref_parent_path)
+            if ref_bblock:
+                deps.add(ref_bblock.identifier)
 
         return deps
 
@@ -235,6 +347,10 @@ def write_superbblocks_schemas(super_bblocks: dict[Path, BuildingBlock],
     def process_sbb(sbb_dir: Path, sbb: BuildingBlock, skip_dirs) -> dict:
         any_of = []
         parsed = set()
+        # Resolved once, so that globbed schema files are absolute as well. This is also
+        # what makes the "schema_file.parent == sbb_dir" check below match when sbb_dir
+        # is passed in as a relative path (e.g., the annotated output directory)
+        sbb_dir = sbb_dir.resolve()
         for schema_fn in ('schema.yaml', 'schema.json'):
             for schema_file in sorted(sbb_dir.glob(f"**/{schema_fn}")):
                 # Skip schemas in superbblock directory, avoid double parsing
@@ -244,7 +360,8 @@ def write_superbblocks_schemas(super_bblocks: dict[Path, BuildingBlock],
                         or schema_file.parents in skip_dirs:
                     continue
 
-                schema = load_yaml(schema_file)
+                # Nested super bblocks parse the same child schemas more than once
+                schema = load_yaml_cached(schema_file)
                 if not isinstance(schema, dict):
                     continue
 
@@ -253,8 +370,7 @@ def write_superbblocks_schemas(super_bblocks: dict[Path, BuildingBlock],
                     continue
 
                 schema_file = schema_file.resolve()
-                parent_dir = schema_file.parent.resolve()
-                sbb_dir = sbb_dir.resolve()
+                parent_dir = schema_file.parent
 
                 def ref_updater(ref):
                     if not is_url(ref):
@@ -306,7 +422,13 @@ def write_superbblocks_schemas(super_bblocks: dict[Path, BuildingBlock],
 
 
 def write_jsonld_context(annotated_schema: Path) -> Path | None:
-    ctx_builder = ContextBuilder(annotated_schema)
+    # Read the schema directly instead of checking for its existence first
+    try:
+        with open(annotated_schema) as f:
+            contents = f.read()
+    except FileNotFoundError:
+        return None
+    ctx_builder = ContextBuilder(annotated_schema, contents=contents)
     if not ctx_builder.context.get('@context'):
         return None
     context_fn = annotated_schema.parent / 'context.jsonld'
@@ -316,19 +438,20 @@ def write_jsonld_context(annotated_schema: Path) -> Path | None:
 
 
 def update_refs(schema: Any, updater: Callable[[str], str]):
-    pending = deque()
-    pending.append(schema)
+    # Visiting order does not matter, so a plain list is used as a LIFO stack
+    pending = [schema]
 
     while pending:
-        sub_schema = pending.popleft()
+        sub_schema = pending.pop()
         if isinstance(sub_schema, dict):
-            for k in list(sub_schema.keys()):
-                if k == '$ref' and isinstance(sub_schema[k], str):
-                    sub_schema[k] = updater(sub_schema[k])
-                else:
-                    pending.append(sub_schema[k])
-        elif isinstance(sub_schema, Sequence) and not isinstance(sub_schema, str):
-            pending.extend(sub_schema)
+            # Snapshot items, since sub_schema is updated while iterating
+            for k, v in list(sub_schema.items()):
+                if k == '$ref' and isinstance(v, str):
+                    sub_schema[k] = updater(v)
+                elif isinstance(v, (dict, list)):
+                    pending.append(v)
+        elif isinstance(sub_schema, list):
+            pending.extend(item for item in sub_schema if isinstance(item, (dict, list)))
 
     return schema
 
@@ -349,7 +472,7 @@ def annotate_schema(bblock: BuildingBlock,
             schema_url = ref_schema
         else:
             schema_fn = ref_schema
-    elif bblock.schema.is_file():
+    elif bblock.schema_exists:
         schema_fn = bblock.schema
 
     if not schema_fn and not schema_url:
@@ -383,7 +506,7 @@ def annotate_schema(bblock: BuildingBlock,
     result.append(annotated_schema_fn)
 
     # JSON
-    update_refs(annotated_schema, lambda s: re.sub(r'\.yaml$', '.json', s))
+    update_refs(annotated_schema, lambda s: s[:-len('.yaml')] + '.json' if s.endswith('.yaml') else s)
     annotated_schema_json_fn = annotated_schema_fn.with_suffix('.json')
     with open(annotated_schema_json_fn, 'w') as f:
         json.dump(annotated_schema, f, indent=2)
@@ -434,7 +557,7 @@ def resolve_schema_reference(ref: str,
 def get_git_repo_url(url: str) -> str:
     if not url:
         return url
-    m = re.match(r'^(?:git@|https?://(?:www)?)github.com[:/](.+)/(.+).git$', url)
+    m = GITHUB_REPO_URL_RE.match(url)
     if m:
         groups = m.groups()
         return f"https://github.com/{groups[0]}/{groups[1]}"
@@ -1,11 +1,12 @@
 from __future__ import annotations
 
 import json
+import os
 import shutil
 from pathlib import Path
 from typing import Any
 from urllib.parse import urlsplit
-from urllib.request import urlopen
+from urllib.request import urlopen, url2pathname
 
 import jsonschema
 import pyld.jsonld
@@ -14,11 +15,19 @@ from jsonschema.validators import validator_for
 from ogc.na.util import validate as shacl_validate, load_yaml
 from rdflib import Graph
 
-from ogc.bblocks.util import BuildingBlock
+from ogc.bblocks.util import BuildingBlock, load_json, load_yaml_cached
 import traceback
 
 OUTPUT_SUBDIR = 'output'
 
+# Shared session so that remote schema fetches reuse (keep-alive) connections
+_http_session = requests.Session()
+_http_session.mount('http://', requests.adapters.HTTPAdapter(pool_connections=16, pool_maxsize=16))
+_http_session.mount('https://', requests.adapters.HTTPAdapter(pool_connections=16, pool_maxsize=16))
+
+# Remote schemas are the same for every bblock, so they are only fetched once (per process)
+_remote_schemas: dict[str, Any] = {}
+
 
 class ValidationReport:
 
@@ -67,10 +76,10 @@ def _validate_resource(filename: Path,
 
         if filename.suffix in ('.json', '.jsonld'):
             if resource_contents:
-                json_doc = load_yaml(content=resource_contents)
+                json_doc = load_json(content=resource_contents)
                 report.add_info('Files', f'Using {filename.name} from examples')
             else:
-                json_doc = load_yaml(filename=filename)
+                json_doc = load_json(filename=filename)
                 report.add_info('Files', f'Using {filename.name}')
 
             if '@graph' in json_doc:
@@ -161,12 +170,20 @@ def validate_test_resources(bblock: BuildingBlock,
     result = True
     test_count = 0
 
-    if not bblock.tests_dir.is_dir() and not bblock.examples:
+    # Single directory listing for the existence check, SHACL files and test resources
+    try:
+        with os.scandir(bblock.tests_dir.resolve()) as it:
+            test_files = [Path(entry.path) for entry in it]
+        has_tests_dir = True
+    except (FileNotFoundError, NotADirectoryError):
+        test_files = []
+        has_tests_dir = False
+    if not has_tests_dir and not bblock.examples:
         return result, test_count
 
     shacl_graph = Graph()
     shacl_error = None
-    shacl_files = list(bblock.tests_dir.glob('*.shacl'))
+    shacl_files = [f for f in test_files if f.suffix == '.shacl']
     try:
         for shacl_file in shacl_files:
             shacl_graph.parse(shacl_file, format='turtle')
@@ -183,8 +200,11 @@ def validate_test_resources(bblock: BuildingBlock,
     try:
         if bblock.annotated_schema:
             schema_validator = get_json_validator(bblock)
-        if bblock.jsonld_context.is_file():
-            jsonld_context = load_yaml(filename=bblock.jsonld_context)
+        try:
+            jsonld_context = load_json(filename=bblock.jsonld_context)
+        except FileNotFoundError:
+            # No context for this bblock; avoids stat'ing the file before reading it
+            pass
     except Exception as e:
         json_error = f"{type(e).__name__}: {e}"
 
@@ -196,8 +216,8 @@ def validate_test_resources(bblock: BuildingBlock,
     output_dir.mkdir(parents=True, exist_ok=True)
 
     # Test resources
-    if bblock.tests_dir.is_dir():
-        for fn in bblock.tests_dir.resolve().iterdir():
+    if has_tests_dir:
+        for fn in test_files:
             output_fn = output_dir / fn.name
 
             result = not _validate_resource(
@@ -249,7 +269,18 @@ class RefResolver(jsonschema.validators.RefResolver):
         if scheme in self.handlers:
             result = self.handlers[scheme](uri)
         elif scheme in ["http", "https"]:
-            result = load_yaml(content=requests.get(uri).content)
+            if uri in _remote_schemas:
+                result = _remote_schemas[uri]
+            else:
+                response = _http_session.get(uri)
+                # Do not keep (and reuse) error responses
+                response.raise_for_status()
+                result = load_yaml(content=response.content)
+                _remote_schemas[uri] = result
+        elif scheme == "file":
+            # Annotated schemas of other bblocks are $ref'd by many validators; parse each once.
+            # Resolved documents are not modified, so they can be shared without copying
+            result = load_yaml_cached(Path(url2pathname(urlsplit(uri).path)), copy_result=False)
         else:
             # Otherwise, pass off to urllib and assume utf-8
             with urlopen(uri) as url: